@@ -1,6 +1,34 @@
+import os
+import sys
+from functools import lru_cache
+
 import numpy as np
+import matplotlib
+
+# Render headless with Agg when imported, so callers that only want the Figure skip the GUI backend setup.
+# Leave the backend alone when running the script, when MPLBACKEND is set, or when pyplot is already in use.
+if __name__ != "__main__" and "MPLBACKEND" not in os.environ and "matplotlib.pyplot" not in sys.modules:
+    matplotlib.use("Agg")
+
 import matplotlib.pyplot as plt
-import matplotlib.colors as mcolors
+from matplotlib.collections import LineCollection
+from matplotlib.colors import to_rgba
+
+try:
+    from numba import njit
+    HAVE_NUMBA = True
+except ImportError:
+    # Numba is optional, fall back to plain NumPy
+    HAVE_NUMBA = False
+
+    def njit(*args, **kwargs):
+        def decorator(fn):
+            return fn
+        return decorator
+
+# Shared text styles for the arc labels and the legend
+LABEL_KW = dict(ha='center', va='center', fontsize=10, fontweight='bold', color='black')
+LEGEND_KW = dict(ha='center', va='center', fontsize=12, fontweight='bold', color='grey')
 
 """
 The average length of a car varies depending on the type of vehicle, but for general reference:
@@ -18,6 +46,10 @@ def distance_as_car_length(distance, avg_car_length=4.5):
     car_lengths = round((distance / avg_car_length) * 2) / 2
     return int(car_lengths) if car_lengths.is_integer() else car_lengths
 
+# Vectorized distance_as_car_length, returns a float array of car lengths rounded to the nearest half
+def distance_as_car_length_vec(distance, avg_car_length=4.5):
+    return np.round((np.asarray(distance) / avg_car_length) * 2) / 2
+
 """
 Calculate the stopping distance based on the speed of the car.
 The AASHTO stopping distance formula is as follows:
@@ -45,88 +77,190 @@ In reality, many drivers are able to hit the brake much faster. You can use the
 :return: Stopping distance in meters (m)
 """
 def stopping_distance(speed_kmh, reaction_time=1.5, friction_coeff=0.7, slope=0):
-    total_stopping_distance = (0.278 * reaction_time * speed_kmh) + speed_kmh ** 2 / (254 * (friction_coeff + slope))
-    
+    if np.ndim(speed_kmh) == 0:
+        # scalar path, returns a plain float
+        return round(_stopping_distance(float(speed_kmh), float(reaction_time), float(friction_coeff), float(slope)), 1)
+
+    # the kernel takes 1-D arrays, so flatten and restore the caller's shape afterwards
+    speed_kmh = np.asarray(speed_kmh, dtype=np.float64)
+    total_stopping_distance = _stopping_distance(speed_kmh.ravel(), float(reaction_time), float(friction_coeff), float(slope)).reshape(speed_kmh.shape)
+
+    # round to 1 decimal point, in place on the freshly computed array
+    total_stopping_distance.round(1, out=total_stopping_distance)
+    return total_stopping_distance
+
+@njit(["float64(float64, float64, float64, float64)", "float64[:](float64[:], float64, float64, float64)"], cache=True, error_model='numpy')
+def _stopping_distance(speed_kmh, reaction_time, friction_coeff, slope):
+    return (0.278 * reaction_time * speed_kmh) + speed_kmh ** 2 / (254 * (friction_coeff + slope))
+
+"""
+Compute the time to cover 10 km and the stopping distance for every speed.
+With numba both are filled in a single compiled pass over the speeds, otherwise with vectorized NumPy.
+The stopping distance uses the same AASHTO formula as stopping_distance.
+
+:param speeds: Array of speeds of the car in kilometers per hour (km/h), of any shape
+:param reaction_time: Driver's reaction time in seconds (default is 1.5 seconds)
+:param friction_coeff: Friction coefficient between tyres and the road. It is assumed to be 0.7 on a dry road and between 0.3 and 0.4 on a wet road.
+:param slope: Grade/slope of the road expressed as a decimal.
+:return: Tuple of (minutes per 10 km, stopping distance in meters rounded to 1 decimal point) arrays
+"""
+def compute_gauge(speeds, reaction_time=1.5, friction_coeff=0.7, slope=0):
+    speeds = np.asarray(speeds, dtype=np.float64)
+    # both paths work on the flattened speeds and restore the caller's shape afterwards
+    flat_speeds = speeds.ravel()
+    if HAVE_NUMBA:
+        times, stopping_distances = _compute_gauge(flat_speeds, float(reaction_time), float(friction_coeff), float(slope))
+    else:
+        # 10 km / (v / 60 km per minute)
+        with np.errstate(divide='ignore'):
+            times = 600.0 / flat_speeds
+        stopping_distances = _stopping_distance(flat_speeds, reaction_time, friction_coeff, slope)
+    times = times.reshape(speeds.shape)
+    stopping_distances = stopping_distances.reshape(speeds.shape)
+
     # round to 1 decimal point
-    return np.round(total_stopping_distance, 1)
+    stopping_distances.round(1, out=stopping_distances)
+    return times, stopping_distances
+
+# error_model='numpy' makes division by a zero speed give inf, as in the NumPy fallback
+@njit(cache=True, error_model='numpy')
+def _compute_gauge(speeds, reaction_time, friction_coeff, slope):
+    n = speeds.size
+    times = np.empty(n)
+    stopping_distances = np.empty(n)
+    for i in range(n):
+        v = speeds[i]
+        # 10 km / (v / 60 km per minute)
+        times[i] = 600.0 / v
+        stopping_distances[i] = _stopping_distance(v, reaction_time, friction_coeff, slope)
+    return times, stopping_distances
+
+# Build the (N-1, 2, 2) array of consecutive point pairs making up a polyline
+def arc_segments(xs, ys):
+    # fill a preallocated C-contiguous array rather than stacking slices
+    segments = np.empty((len(xs) - 1, 2, 2))
+    segments[:, 0, 0] = xs[:-1]
+    segments[:, 0, 1] = ys[:-1]
+    segments[:, 1, 0] = xs[1:]
+    segments[:, 1, 1] = ys[1:]
+    return segments
+
+# RGBA values of the named colors used by the gauge, matching matplotlib.colors.to_rgba
+_NAMED_COLORS = {
+    'red': (1.0, 0.0, 0.0, 1.0),
+    'blue': (0.0, 0.0, 1.0, 1.0),
+    'orange': (1.0, 165 / 255, 0.0, 1.0),
+    'yellow': (1.0, 1.0, 0.0, 1.0),
+    'green': (0.0, 128 / 255, 0.0, 1.0),
+}
+
+# RGBA value of a color, skipping matplotlib's color registry for the gauge's own palette
+def _rgba(color):
+    return _NAMED_COLORS.get(color) or to_rgba(color)
 
-# Function to compute color gradient
+# Function to compute color gradient, as an (n, 4) RGBA array.
+# Results are cached and shared between calls, so they are returned read-only.
+@lru_cache(maxsize=64)
 def compute_gradient_color(start_color, end_color, n):
-    return [mcolors.to_hex(c) for c in np.linspace(mcolors.to_rgba(start_color), mcolors.to_rgba(end_color), n)]
+    gradient = np.linspace(_rgba(start_color), _rgba(end_color), n)
+    gradient.flags.writeable = False
+    return gradient
 
-def plot_speedmeter_pacemeter_fuelmeter():
-    # Define the speed range and calculate the corresponding time to cover 10 km
-    speeds = np.arange(10, 151, 1)  # Speeds from 10 to 150 km/h
-    distance_travelled_in_1_minute = (speeds / 60)
-    times = 10 / distance_travelled_in_1_minute  # Time in minutes to cover 10 km
-    stopping_distances = stopping_distance(speeds) # distance, in meters, it takes to stop immediately
+# Angles of the n points along the gauge arcs, cached and read-only like the gradients
+@lru_cache(maxsize=32)
+def arc_theta(n):
+    theta = np.linspace(-5/8 * np.pi - np.pi/2, 5/8 * np.pi - np.pi/2, n)
+    theta.flags.writeable = False
+    return theta
+
+# Format stopping distances as car lengths, dropping the decimal on whole numbers
+def car_length_labels(distances):
+    return [f"{int(v)}" if v == int(v) else f"{v}" for v in distance_as_car_length_vec(distances)]
+
+"""
+Draw the three-arc gauge. The outer arc shows the speed and the middle arc the minutes per 10 km,
+the inner arc shows whichever metric is passed in.
+
+:param speeds: Speeds of the car in kilometers per hour (km/h)
+:param times: Minutes to cover 10 km at each speed
+:param inner_metric: Value of the inner arc metric at each speed
+:param inner_label_fn: Turns the labelled inner metric values into label strings
+:param inner_gradient: (start, end) colors of the inner arc, any matplotlib color
+:param title: Legend line describing the inner arc
+:param speed_step: Only speeds that are multiples of this are labelled, on the outer and inner arcs
+:return: The gauge figure
+"""
+def render_gauge(speeds, times, inner_metric, inner_label_fn, inner_gradient, title, speed_step=10):
+    speeds = np.asarray(speeds)
+    times = np.asarray(times)
+    inner_metric = np.asarray(inner_metric)
 
     # Calculate the theta values for the arc
-    theta_rotated = np.linspace(-5/8 * np.pi - np.pi/2, 5/8 * np.pi - np.pi/2, len(speeds))
+    theta_rotated = arc_theta(len(speeds))
 
     # Gradient settings for outer line (red to blue) and inner line (red -> yellow -> green)
     outer_gradient_colors_blue_mid = compute_gradient_color('red', 'blue', len(speeds))
     
-    outer_gradient_colors_orange_mid = compute_gradient_color('red', 'orange', len(speeds))
+    last_gradient_colors = compute_gradient_color(*inner_gradient, len(speeds))
 
     inner_transition_point1 = len(speeds) // 3
     inner_transition_point2 = 2 * len(speeds) // 3
 
-    red_to_yellow = compute_gradient_color('red', 'yellow', inner_transition_point1)
-    yellow_segment = ['yellow'] * (inner_transition_point2 - inner_transition_point1)
-    yellow_to_green = compute_gradient_color('yellow', 'green', len(speeds) - inner_transition_point2)
-    inner_gradient_combined = red_to_yellow + yellow_segment + yellow_to_green
+    # red -> yellow, solid yellow, yellow -> green, filled into one preallocated array
+    inner_gradient_combined = np.empty((len(speeds), 4))
+    inner_gradient_combined[:inner_transition_point1] = compute_gradient_color('red', 'yellow', inner_transition_point1)
+    inner_gradient_combined[inner_transition_point1:inner_transition_point2] = _NAMED_COLORS['yellow']
+    inner_gradient_combined[inner_transition_point2:] = compute_gradient_color('yellow', 'green', len(speeds) - inner_transition_point2)
+
+    # Evaluate the trig once and reuse it for every arc and label
+    cos_f = np.cos(theta_rotated)
+    sin_f = np.sin(theta_rotated)
+    # Reversed views of the same values flip the axis for the labels
+    cos_r = cos_f[::-1]
+    sin_r = sin_f[::-1]
 
-    # Reverse the theta values to flip the axis
-    theta_reversed = theta_rotated[::-1]
+    # Segments of the unit arc, scaled to each of the three arcs below
+    unit_segments = arc_segments(cos_f, sin_f)
 
     # Create the figure and axis
     fig, ax = plt.subplots(figsize=(8, 8))
 
-    # Plot the speed markers on the arc, displaying only multiples of 10, with reversed axis
-    for i, speed in enumerate(speeds):
-        if speed % 10 == 0:
-            x = -np.cos(theta_reversed[i])
-            y = -np.sin(theta_reversed[i])
-            ax.text(x, y, f"{speed}", ha='center', va='center', fontsize=10, fontweight='bold', color='black')
+    # Plot the speed markers on the arc, displaying only multiples of speed_step, with reversed axis
+    text = ax.text
+    speed_mask = speeds % speed_step == 0
+    xs, ys = -cos_r[speed_mask], -sin_r[speed_mask]
+    labels = [f"{speed}" for speed in speeds[speed_mask]]
+    for x, y, label in zip(xs, ys, labels):
+        text(x, y, label, **LABEL_KW)
     # Draw the outer arc with the reversed axis
-    outer_arc_x = np.cos(theta_rotated)
-    outer_arc_y = np.sin(theta_rotated)
-    for i in range(len(outer_gradient_colors_blue_mid)):
-        ax.plot(-outer_arc_x[i:i+2], -outer_arc_y[i:i+2], color=outer_gradient_colors_blue_mid[i])
+    ax.add_collection(LineCollection(-unit_segments, colors=outer_gradient_colors_blue_mid[:-1]))
 
     # Plot the time markers on the inner arc, displaying only whole numbers and skipping the last value (120 km/h)
     gap_coefficient = -0.9
-    last_i = -10
-    for i, time in enumerate(times):
-        if time.is_integer():
-            if (i - last_i < 3):
-                last_i = i
-                continue
-            last_i = i
-            x = gap_coefficient * np.cos(theta_reversed[i])
-            y = gap_coefficient * np.sin(theta_reversed[i])
-            ax.text(x, y, f"{int(time)}", ha='center', va='center', fontsize=10, fontweight='bold', color='black')
+    time_indices = np.nonzero(np.isclose(times, np.round(times)))[0]
+    # skip any whole number that is less than 3 steps after the previous one, to avoid overlapping labels
+    time_indices = time_indices[np.diff(time_indices, prepend=-10) >= 3]
+    xs, ys = gap_coefficient * cos_r[time_indices], gap_coefficient * sin_r[time_indices]
+    labels = [f"{time}" for time in np.round(times[time_indices]).astype(int)]
+    for x, y, label in zip(xs, ys, labels):
+        text(x, y, label, **LABEL_KW)
     # Draw the inner arc with the reversed axis
-    for i in range(len(inner_gradient_combined)):
-        ax.plot(gap_coefficient * outer_arc_x[i:i+2], gap_coefficient * outer_arc_y[i:i+2], color=inner_gradient_combined[i])
+    ax.add_collection(LineCollection(gap_coefficient * unit_segments, colors=inner_gradient_combined[:-1]))
         
     # Plot the consumption markers on the last inner arc
     gap_coefficient = -0.75
-    for i, distance in enumerate(stopping_distances):
-        if i % 10 == 0:
-            car_length = distance_as_car_length(distance)
-            x = gap_coefficient * np.cos(theta_reversed[i])
-            y = gap_coefficient * np.sin(theta_reversed[i])
-            ax.text(x, y, f"{car_length}", ha='center', va='center', fontsize=10, fontweight='bold', color='black')
+    # label the same speeds as the outer arc so the markers line up
+    xs, ys = gap_coefficient * cos_r[speed_mask], gap_coefficient * sin_r[speed_mask]
+    labels = inner_label_fn(inner_metric[speed_mask])
+    for x, y, label in zip(xs, ys, labels):
+        text(x, y, label, **LABEL_KW)
     # Draw the inner arc with the reversed axis
-    for i in range(len(outer_gradient_colors_orange_mid)):
-        ax.plot(gap_coefficient * outer_arc_x[i:i+2], gap_coefficient * outer_arc_y[i:i+2], color=outer_gradient_colors_orange_mid[i])
+    ax.add_collection(LineCollection(gap_coefficient * unit_segments, colors=last_gradient_colors[:-1]))
 
     # Adjust the legend positions with bold grey font
-    ax.text(0, -0.1, "Top: Speed (km/h)", ha='center', va='center', fontsize=12, fontweight='bold', color='grey')
-    ax.text(0, -0.2, "Middle: Minutes per 10 km", ha='center', va='center', fontsize=12, fontweight='bold', color='grey')
-    ax.text(0, -0.3, "Bottom: Stopping distance (cars)", ha='center', va='center', fontsize=12, fontweight='bold', color='grey')
+    ax.text(0, -0.1, "Top: Speed (km/h)", **LEGEND_KW)
+    ax.text(0, -0.2, "Middle: Minutes per 10 km", **LEGEND_KW)
+    ax.text(0, -0.3, title, **LEGEND_KW)
 
     # Set up the plot
     ax.set_xlim(-1.1, 1.1)
@@ -134,7 +268,16 @@ def plot_speedmeter_pacemeter_fuelmeter():
     ax.set_aspect('equal')
     ax.axis('off')
 
-    # Return the plot
-    return plt
+    # Return the figure
+    return fig
+
+def plot_speedmeter_pacemeter_fuelmeter():
+    # Define the speed range and calculate the corresponding time to cover 10 km
+    speeds = np.arange(10, 151, 1)  # Speeds from 10 to 150 km/h
+    # Time in minutes to cover 10 km and distance, in meters, it takes to stop immediately
+    times, stopping_distances = compute_gauge(speeds)
+    return render_gauge(speeds, times, stopping_distances, car_length_labels, ('red', 'orange'), "Bottom: Stopping distance (cars)")
 
-plot_speedmeter_pacemeter_fuelmeter().show()
\ No newline at end of file
+if __name__ == "__main__":
+    plot_speedmeter_pacemeter_fuelmeter()
+    plt.show()